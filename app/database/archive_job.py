@@ -0,0 +1,47 @@
+"""Moves the classes and absences of past semesters into the archive tables.
+
+Rows are moved in small batches, each in its own short transaction, so the active tables are
+never locked for long and the bot can keep running while the job works.
+
+    python -m app.database.archive_job 2024.1 2024.2 --batch-size 500 --pause 0.1
+"""
+import argparse
+import time
+
+from dotenv import load_dotenv
+
+from app.database.bot_db import BotDB
+from app.src.config import get_logger
+
+def archive_semester(db_client: BotDB, semester: str, batch_size: int, pause: float, logger) -> int:
+    """Archives every class of ``semester`` in batches and returns how many were moved."""
+    db_client.db.ensure_archive_partition(semester)
+    total = 0
+    while True:
+        moved = db_client.archive_semester_batch(semester, batch_size)
+        if not moved:
+            break
+        total += moved
+        logger.info(f"Semester '{semester}': {total} classes archived so far.")
+        time.sleep(pause)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("semesters", nargs="+", help="Semesters to archive, exactly as stored in classes.semester.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Classes moved per transaction.")
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to wait between batches.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logger = get_logger(__name__)
+    db_client = BotDB(logger)
+    try:
+        for semester in args.semesters:
+            total = archive_semester(db_client, semester, args.batch_size, args.pause, logger)
+            logger.info(f"Semester '{semester}' archived: {total} classes moved.")
+    finally:
+        db_client.close_connection()
+
+if __name__ == "__main__":
+    main()
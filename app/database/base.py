@@ -1,18 +1,27 @@
 import os
+import re
+import hashlib
 import psycopg2
 import logging
 import sys
 
+from app.database.storage import QUERY_LOG_EXTRA, Storage
+
 logger = logging.getLogger(__name__)
 
-class Base:
+# PostgreSQL truncates identifiers longer than this many bytes.
+MAX_IDENTIFIER_LENGTH = 63
+
+class Base(Storage):
+    ROW_LOCK_CLAUSE = "FOR UPDATE"
+
     def __init__(self):
+        super().__init__()
         self.host = os.getenv("PG_HOST")
         self.base_database = os.getenv("PG_BASE_DATABASE")
         self.user = os.getenv("PG_USER")
         self.password = os.getenv("PG_PASSWORD")
         self.port = os.getenv("PG_PORT")
-        self.conn = None
         self.cursor = None
 
     def connect(self, database: str = None):
@@ -45,43 +54,69 @@ class Base:
 
     def execute_query(self, query, params=None):
         """Executes a query with the given parameters."""
-        try:
-            if self.conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
-                logger.warning("Transaction in error state, rolling back before executing new query.")
-                self.conn.rollback()
-            logger.debug(f"Executing query: {query} with params: {params}")
-            self.cursor.execute(query, params)
-            self.conn.commit()
-            logger.debug("Query executed successfully.")
-        except Exception as e:
-            _, _, exc_tb = sys.exc_info()
-            logger.error(f"Error executing query on line {exc_tb.tb_lineno}: {e}", exc_info=True)
-            self.conn.rollback()
-            raise
+        with self.lock:
+            try:
+                if self.conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                    logger.warning("Transaction in error state, rolling back before executing new query.")
+                    self.conn.rollback()
+                logger.debug("Executing query: %s with params: %s", query, params, extra=QUERY_LOG_EXTRA)
+                self.cursor.execute(query, params)
+                if not self.in_transaction:
+                    self.conn.commit()
+                logger.debug("Query executed successfully.", extra=QUERY_LOG_EXTRA)
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error executing query on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                if not self.in_transaction:
+                    self.conn.rollback()
+                raise
 
     def fetch_all(self, query, params=None):
         """Executes a query and fetches all results."""
-        try:
-            logger.debug(f"Fetching all results for query: {query} with params: {params}")
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
-        except Exception as e:
-            _, _, exc_tb = sys.exc_info()
-            logger.error(f"Error fetching data on line {exc_tb.tb_lineno}: {e}", exc_info=True)
-            self.conn.rollback()
-            raise
+        with self.lock:
+            try:
+                logger.debug("Fetching all results for query: %s with params: %s", query, params, extra=QUERY_LOG_EXTRA)
+                self.cursor.execute(query, params)
+                return self.cursor.fetchall()
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error fetching data on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                if not self.in_transaction:
+                    self.conn.rollback()
+                raise
 
     def fetch_one(self, query, params=None):
         """Executes a query and fetches a single result."""
-        try:
-            if self.conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
-                logger.warning("Transaction in error state, rolling back before executing new query.")
-                self.conn.rollback()
-            logger.debug(f"Fetching one result for query: {query} with params: {params}")
-            self.cursor.execute(query, params)
-            return self.cursor.fetchone()
-        except Exception as e:
-            _, _, exc_tb = sys.exc_info()
-            logger.error(f"Error fetching data on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+        with self.lock:
+            try:
+                if self.conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                    logger.warning("Transaction in error state, rolling back before executing new query.")
+                    self.conn.rollback()
+                logger.debug("Fetching one result for query: %s with params: %s", query, params, extra=QUERY_LOG_EXTRA)
+                self.cursor.execute(query, params)
+                return self.cursor.fetchone()
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error fetching data on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                if not self.in_transaction:
+                    self.conn.rollback()
+                raise
+
+    def ensure_archive_partition(self, semester: str):
+        """Creates the semester's partitions of the archive tables if they don't exist yet.
+
+        Runs in its own short transaction, so the parent tables are locked only while the partitions are created.
+        """
+        digest = hashlib.md5(semester.encode()).hexdigest()[:8]
+        slug_length = MAX_IDENTIFIER_LENGTH - len("archived_absences_") - len(digest) - 1
+        slug = re.sub(r"[^a-z0-9]+", "_", semester.lower()).strip("_")[:slug_length]
+        suffix = f"{slug}_{digest}"
+        for table in ("archived_classes", "archived_absences"):
+            self.execute_query(f"CREATE TABLE IF NOT EXISTS {table}_{suffix} PARTITION OF {table} FOR VALUES IN (%s);", (semester,))
+        logger.debug("Archive partitions ensured for semester %s.", semester)
+
+    def _begin(self):
+        """Clears a failed transaction left on the connection; psycopg2 opens the new one implicitly."""
+        if self.conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            logger.warning("Transaction in error state, rolling back before starting a new transaction.")
             self.conn.rollback()
-            raise
@@ -1,18 +1,18 @@
-import os
 import uuid
 import sys
 from datetime import datetime, timezone
 
-from app.database.base import Base
+from app.database.storage import Storage, create_storage
+
+# Fractions of a class' absence limit that trigger an alert when crossed by a write.
+ALERT_THRESHOLDS = (0.75, 1.0)
 
 class BotDB:
     """Manages all database operations for the bot."""
 
-    def __init__(self, logger):
-        """Initializes the database connection."""
-        self.db = Base()
-        self.database = os.environ.get("PG_DATABASE")
-        self.db.connect(self.database)
+    def __init__(self, logger, storage: Storage = None):
+        """Initializes the database connection, using the DB_BACKEND storage unless one is given."""
+        self.db = storage or create_storage()
         self.logger = logger
         self.logger.info("BotDB initialized and connected to database.")
 
@@ -46,7 +46,7 @@ class BotDB:
             self.logger.error(f"Error checking if chat {chat_id} exists on line {exc_tb.tb_lineno}: {e}", exc_info=True)
             raise
 
-    def insert_class(self, chat_id: str, class_id: str, name: str, semester: str = None):
+    def insert_class(self, chat_id: str, class_id: str, name: str, semester: str = None, absence_limit: int = None):
         """Inserts a new class, avoiding duplicates."""
         try:
             exists_query = "SELECT id FROM classes WHERE class_id = %s AND chat_id = %s;"
@@ -54,9 +54,9 @@ class BotDB:
                 self.logger.info(f"Class {class_id} already exists for chat {chat_id}, skipping insertion.")
                 return
 
-            insert_query = "INSERT INTO classes (id, chat_id, class_id, name, semester, ts) VALUES (%s, %s, %s, %s, %s, %s);"
+            insert_query = "INSERT INTO classes (id, chat_id, class_id, name, semester, absence_limit, ts) VALUES (%s, %s, %s, %s, %s, %s, %s);"
             generated_uuid = str(uuid.uuid4())
-            self.db.execute_query(insert_query, (generated_uuid, chat_id, class_id, name, semester, datetime.now(timezone.utc).astimezone()))
+            self.db.execute_query(insert_query, (generated_uuid, chat_id, class_id, name, semester, absence_limit, datetime.now(timezone.utc).astimezone()))
             self.logger.info(f"Class '{name}' ({class_id}) inserted successfully with UUID {generated_uuid} for chat {chat_id}.")
         except Exception as e:
             _, _, exc_tb = sys.exc_info()
@@ -65,30 +65,92 @@ class BotDB:
 
     def insert_absence(self, chat_id: str, class_id: str):
         """Increments absence counter for a chat and class, or creates a new entry."""
-        try:
-            class_uuid_query = "SELECT id FROM classes WHERE class_id = %s AND chat_id = %s;"
-            class_uuid_result = self.db.fetch_one(class_uuid_query, (class_id, chat_id))
-            if not class_uuid_result:
-                self.logger.warning(f"Attempted to add absence for non-existent class_id: {class_id} for chat {chat_id}")
-                return False
-            class_uuid = class_uuid_result[0]
+        result = self.insert_absences(chat_id, {class_id: 1})
+        return class_id in result["added"]
 
-            absence_query = "SELECT counter FROM absences WHERE chat_id = %s AND class_id = %s;"
-            current_absence = self.db.fetch_one(absence_query, (chat_id, class_uuid))
+    def insert_absences(self, chat_id: str, class_counts) -> dict:
+        """Adds absences for several classes of a chat in a single transaction.
 
-            if current_absence:
-                new_counter = current_absence[0] + 1
-                update_query = "UPDATE absences SET counter = %s, updated_at = %s WHERE chat_id = %s AND class_id = %s;"
-                self.db.execute_query(update_query, (new_counter, datetime.now(timezone.utc).astimezone(), chat_id, class_uuid))
-                self.logger.info(f"Absence count for chat {chat_id} in class {class_id} updated to {new_counter}.")
+        ``class_counts`` maps each class_id to the number of absences to add. It may also be a
+        function that builds that mapping from the chat's registered class_ids, for input that can
+        only be split into classes once they are known; the classes are still read with one query.
+        Returns a dict with ``counts`` (the mapping applied), ``added`` (class_id -> new total, in
+        input order), ``not_found`` (unknown class_ids) and ``alerts`` (absence limit thresholds
+        crossed by this write).
+        """
+        if not class_counts:
+            return {"counts": {}, "added": {}, "not_found": [], "alerts": []}
+        try:
+            if callable(class_counts):
+                class_uuid_query = "SELECT class_id, id, absence_limit FROM classes WHERE chat_id = %s;"
+                class_uuid_params = (chat_id,)
             else:
-                insert_query = "INSERT INTO absences (chat_id, class_id, counter, updated_at) VALUES (%s, %s, %s, %s);"
-                self.db.execute_query(insert_query, (chat_id, class_uuid, 1, datetime.now(timezone.utc).astimezone()))
-                self.logger.info(f"New absence entry created for chat {chat_id} in class {class_id} with count 1.")
+                placeholders = ", ".join(["%s"] * len(class_counts))
+                class_uuid_query = f"SELECT class_id, id, absence_limit FROM classes WHERE chat_id = %s AND class_id IN ({placeholders});"
+                class_uuid_params = (chat_id, *class_counts)
+            update_query = "UPDATE absences SET counter = counter + %s, updated_at = %s WHERE chat_id = %s AND class_id = %s RETURNING counter;"
+            insert_query = "INSERT INTO absences (chat_id, class_id, counter, updated_at) VALUES (%s, %s, %s, %s);"
+            added = {}
+            now = datetime.now(timezone.utc).astimezone()
+            with self.db.transaction():
+                class_rows = self.db.fetch_all(class_uuid_query, class_uuid_params)
+                class_uuids = {row[0]: row[1] for row in class_rows}
+                absence_limits = {row[0]: row[2] for row in class_rows}
+                if callable(class_counts):
+                    class_counts = class_counts(set(class_uuids))
+                class_ids = list(class_counts)
+                for class_id in class_ids:
+                    if class_id not in class_uuids:
+                        continue
+                    amount = class_counts[class_id]
+                    updated = self.db.fetch_one(update_query, (amount, now, chat_id, class_uuids[class_id]))
+                    if updated:
+                        added[class_id] = updated[0]
+                    else:
+                        self.db.execute_query(insert_query, (chat_id, class_uuids[class_id], amount, now))
+                        added[class_id] = amount
+
+            not_found = [class_id for class_id in class_ids if class_id not in class_uuids]
+            if not_found:
+                self.logger.warning(f"Attempted to add absence for non-existent class_ids: {not_found} for chat {chat_id}")
+            self.logger.info(f"Absence counts for chat {chat_id} updated: {added}.")
+
+            alerts = []
+            for class_id, total in added.items():
+                alert = self._check_absence_limit(class_id, total - class_counts[class_id], total, absence_limits[class_id])
+                if alert:
+                    alerts.append(alert)
+            if alerts:
+                self.logger.info(f"Absence limit alerts for chat {chat_id}: {alerts}.")
+            return {"counts": class_counts, "added": added, "not_found": not_found, "alerts": alerts}
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error inserting absences for chat {chat_id} on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def _check_absence_limit(self, class_id: str, previous: int, current: int, absence_limit: int):
+        """Returns the highest limit threshold crossed going from ``previous`` to ``current``, if any."""
+        if not absence_limit:
+            return None
+        crossed = [threshold for threshold in ALERT_THRESHOLDS if previous < absence_limit * threshold <= current]
+        if not crossed:
+            return None
+        return {"class_id": class_id, "count": current, "limit": absence_limit, "threshold": max(crossed)}
+
+    def set_absence_limit(self, chat_id: str, class_id: str, absence_limit: int = None) -> bool:
+        """Sets or clears the absence limit of a class."""
+        try:
+            query = "UPDATE classes SET absence_limit = %s WHERE chat_id = %s AND class_id = %s RETURNING id;"
+            with self.db.transaction():
+                result = self.db.fetch_one(query, (absence_limit, chat_id, class_id))
+            if not result:
+                self.logger.debug(f"Class {class_id} not found for chat {chat_id} when setting absence limit.")
+                return False
+            self.logger.info(f"Absence limit for chat {chat_id} in class {class_id} set to {absence_limit}.")
             return True
         except Exception as e:
             _, _, exc_tb = sys.exc_info()
-            self.logger.error(f"Error inserting absence for chat {chat_id}, class {class_id} on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            self.logger.error(f"Error setting absence limit for chat {chat_id}, class {class_id} on line {exc_tb.tb_lineno}: {e}", exc_info=True)
             raise
 
     def get_absence_count(self, chat_id: str, class_id: str) -> int:
@@ -180,13 +242,140 @@ class BotDB:
     def get_all_classes(self, chat_id: str) -> list:
         """Returns all registered classes."""
         try:
-            query = "SELECT class_id, name, semester FROM classes WHERE chat_id = %s;"
+            query = "SELECT class_id, name, semester, absence_limit FROM classes WHERE chat_id = %s;"
             classes = self.db.fetch_all(query, (chat_id,))
             self.logger.debug(f"Retrieved {len(classes) if classes else 0} classes.")
             if classes:
-                return [{"class_id": cls[0], "name": cls[1], "semester": cls[2]} for cls in classes]
+                return [{"class_id": cls[0], "name": cls[1], "semester": cls[2], "absence_limit": cls[3]} for cls in classes]
             return []
         except Exception as e:
             _, _, exc_tb = sys.exc_info()
             self.logger.error(f"Error getting all classes on line {exc_tb.tb_lineno}: {e}", exc_info=True)
             raise
+
+    def get_all_chat_ids(self) -> list:
+        """Returns the ids of all registered chats."""
+        try:
+            results = self.db.fetch_all("SELECT id FROM chats;")
+            self.logger.debug(f"Retrieved {len(results)} chat ids.")
+            return [row[0] for row in results]
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error getting chat ids on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def get_absence_digest(self, chat_ids: list) -> dict:
+        """Returns the absences of several chats in one query, grouped by chat."""
+        if not chat_ids:
+            return {}
+        try:
+            placeholders = ", ".join(["%s"] * len(chat_ids))
+            query = f"""
+                SELECT a.chat_id, c.name, c.class_id, a.counter, c.absence_limit
+                FROM absences a
+                JOIN classes c ON a.class_id = c.id
+                WHERE a.chat_id IN ({placeholders})
+                ORDER BY a.chat_id, c.name;
+            """
+            results = self.db.fetch_all(query, tuple(chat_ids))
+            digest = {}
+            for row in results:
+                digest.setdefault(row[0], []).append({"class_name": row[1], "class_id": row[2], "count": row[3], "absence_limit": row[4]})
+            self.logger.debug(f"Retrieved absence digest for {len(digest)} of {len(chat_ids)} chats.")
+            return digest
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error getting absence digest on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def _archive_classes(self, class_uuids: list, semester: str):
+        """Copies the given classes and their absences to the archive tables and removes them from the active ones.
+
+        Must run inside a transaction that already selected the classes with the storage's row lock.
+        The absences are locked too, so no counter update can land between the copy and the delete.
+        """
+        placeholders = ", ".join(["%s"] * len(class_uuids))
+        now = datetime.now(timezone.utc).astimezone()
+        self.db.fetch_all(f"SELECT 1 FROM absences WHERE class_id IN ({placeholders}) {self.db.ROW_LOCK_CLAUSE};", tuple(class_uuids))
+        self.db.execute_query(f"""
+            INSERT INTO archived_classes (id, chat_id, class_id, name, semester, absence_limit, ts, archived_at)
+            SELECT id, chat_id, class_id, name, semester, absence_limit, ts, %s
+            FROM classes
+            WHERE id IN ({placeholders});
+        """, (now, *class_uuids))
+        self.db.execute_query(f"""
+            INSERT INTO archived_absences (chat_id, class_id, semester, counter, updated_at, archived_at)
+            SELECT chat_id, class_id, %s, counter, updated_at, %s
+            FROM absences
+            WHERE class_id IN ({placeholders});
+        """, (semester, now, *class_uuids))
+        self.db.execute_query(f"DELETE FROM absences WHERE class_id IN ({placeholders});", tuple(class_uuids))
+        self.db.execute_query(f"DELETE FROM classes WHERE id IN ({placeholders});", tuple(class_uuids))
+
+    def close_semester(self, chat_id: str, semester: str) -> int:
+        """Moves a chat's classes of the given semester, and their absences, to the archive. Returns the number of classes moved.
+
+        Classes registered without a semester are never matched, so they stay active.
+        """
+        try:
+            if not semester or not self.db.fetch_one("SELECT 1 FROM classes WHERE chat_id = %s AND semester = %s LIMIT 1;", (chat_id, semester)):
+                self.logger.debug(f"No active classes in semester '{semester}' for chat {chat_id}.")
+                return 0
+            self.db.ensure_archive_partition(semester)
+            with self.db.transaction():
+                query = f"SELECT id FROM classes WHERE chat_id = %s AND semester = %s {self.db.ROW_LOCK_CLAUSE};"
+                class_uuids = [row[0] for row in self.db.fetch_all(query, (chat_id, semester))]
+                if class_uuids:
+                    self._archive_classes(class_uuids, semester)
+            self.logger.info(f"Semester '{semester}' closed for chat {chat_id}: {len(class_uuids)} classes archived.")
+            return len(class_uuids)
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error closing semester '{semester}' for chat {chat_id} on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def archive_semester_batch(self, semester: str, batch_size: int) -> int:
+        """Archives up to ``batch_size`` classes of a semester across all chats in one short transaction. Returns the number moved."""
+        try:
+            with self.db.transaction():
+                query = f"SELECT id FROM classes WHERE semester = %s LIMIT %s {self.db.ROW_LOCK_CLAUSE};"
+                class_uuids = [row[0] for row in self.db.fetch_all(query, (semester, batch_size))]
+                if class_uuids:
+                    self._archive_classes(class_uuids, semester)
+            self.logger.debug(f"Archived batch of {len(class_uuids)} classes for semester '{semester}'.")
+            return len(class_uuids)
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error archiving batch for semester '{semester}' on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def get_archived_semesters(self, chat_id: str) -> list:
+        """Returns the archived semesters of a chat with their number of classes."""
+        try:
+            query = "SELECT semester, COUNT(*) FROM archived_classes WHERE chat_id = %s GROUP BY semester ORDER BY semester;"
+            results = self.db.fetch_all(query, (chat_id,))
+            self.logger.debug(f"Retrieved {len(results)} archived semesters for chat {chat_id}.")
+            return [{"semester": row[0], "classes": row[1]} for row in results]
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error getting archived semesters for chat {chat_id} on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def get_archived_absences(self, chat_id: str, semester: str) -> list:
+        """Returns the archived classes of a chat's semester with their absence counts."""
+        try:
+            query = """
+                SELECT c.name, c.class_id, COALESCE(SUM(a.counter), 0), c.absence_limit
+                FROM archived_classes c
+                LEFT JOIN archived_absences a ON a.class_id = c.id AND a.semester = c.semester
+                WHERE c.chat_id = %s AND c.semester = %s
+                GROUP BY c.id, c.name, c.class_id, c.absence_limit
+                ORDER BY c.name;
+            """
+            results = self.db.fetch_all(query, (chat_id, semester))
+            self.logger.debug(f"Retrieved {len(results)} archived classes for chat {chat_id} in semester '{semester}'.")
+            return [{"class_name": row[0], "class_id": row[1], "count": row[2], "absence_limit": row[3]} for row in results]
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            self.logger.error(f"Error getting archived absences for chat {chat_id} in semester '{semester}' on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
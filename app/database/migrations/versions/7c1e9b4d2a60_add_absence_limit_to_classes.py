@@ -0,0 +1,28 @@
+"""add absence limit to classes
+
+Revision ID: 7c1e9b4d2a60
+Revises: 25a33c04e925
+Create Date: 2026-10-19 10:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e9b4d2a60'
+down_revision: Union[str, Sequence[str], None] = '25a33c04e925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Adds the optional per-class absence limit."""
+    op.add_column('classes', sa.Column('absence_limit', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Drops the per-class absence limit."""
+    op.drop_column('classes', 'absence_limit')
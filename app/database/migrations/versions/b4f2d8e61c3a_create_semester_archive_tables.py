@@ -0,0 +1,60 @@
+"""create semester archive tables
+
+Revision ID: b4f2d8e61c3a
+Revises: 7c1e9b4d2a60
+Create Date: 2026-10-19 14:05:27.402913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f2d8e61c3a'
+down_revision: Union[str, Sequence[str], None] = '7c1e9b4d2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Creates the archive tables, list-partitioned by semester.
+
+    Only empty tables are created here, so the migration holds no long locks. One partition per
+    semester is added when that semester is first archived, and existing data is moved in small
+    batches by ``python -m app.database.archive_job``.
+    """
+    op.execute("""
+        CREATE TABLE archived_classes (
+            id UUID NOT NULL,
+            chat_id VARCHAR,
+            class_id VARCHAR NOT NULL,
+            name VARCHAR NOT NULL,
+            semester VARCHAR NOT NULL,
+            absence_limit INTEGER,
+            ts TIMESTAMP WITH TIME ZONE NOT NULL,
+            archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (semester, id)
+        ) PARTITION BY LIST (semester);
+    """)
+    op.execute("CREATE TABLE archived_classes_default PARTITION OF archived_classes DEFAULT;")
+    op.execute("CREATE INDEX ix_archived_classes_chat_semester ON archived_classes (chat_id, semester);")
+
+    op.execute("""
+        CREATE TABLE archived_absences (
+            chat_id VARCHAR,
+            class_id UUID NOT NULL,
+            semester VARCHAR NOT NULL,
+            counter INTEGER,
+            updated_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+        ) PARTITION BY LIST (semester);
+    """)
+    op.execute("CREATE TABLE archived_absences_default PARTITION OF archived_absences DEFAULT;")
+    op.execute("CREATE INDEX ix_archived_absences_chat_semester ON archived_absences (chat_id, semester);")
+
+
+def downgrade() -> None:
+    """Drops the archive tables and all their partitions."""
+    op.execute("DROP TABLE archived_absences;")
+    op.execute("DROP TABLE archived_classes;")
@@ -0,0 +1,168 @@
+import os
+import sqlite3
+import logging
+import sys
+from datetime import datetime
+
+from app.database.storage import QUERY_LOG_EXTRA, Storage
+
+logger = logging.getLogger(__name__)
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat())
+
+# Schema versions mirroring the Alembic revisions, applied in order and tracked with PRAGMA user_version.
+SCHEMA_MIGRATIONS = [
+    # 25a33c04e925 - create initial tables
+    [
+        """
+        CREATE TABLE IF NOT EXISTS chats (
+            id TEXT PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            ts TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS classes (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            class_id TEXT NOT NULL,
+            semester TEXT,
+            chat_id TEXT REFERENCES chats (id),
+            ts TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            CONSTRAINT uq_class_chat UNIQUE (class_id, chat_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS absences (
+            chat_id TEXT REFERENCES chats (id),
+            class_id TEXT REFERENCES classes (id),
+            counter INTEGER,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+    ],
+    # 7c1e9b4d2a60 - add absence limit to classes
+    [
+        "ALTER TABLE classes ADD COLUMN absence_limit INTEGER;",
+    ],
+    # b4f2d8e61c3a - create semester archive tables (plain tables, SQLite has no partitioning)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS archived_classes (
+            id TEXT NOT NULL,
+            chat_id TEXT,
+            class_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            semester TEXT NOT NULL,
+            absence_limit INTEGER,
+            ts TIMESTAMP NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (semester, id)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_archived_classes_chat_semester ON archived_classes (chat_id, semester);",
+        """
+        CREATE TABLE IF NOT EXISTS archived_absences (
+            chat_id TEXT,
+            class_id TEXT NOT NULL,
+            semester TEXT NOT NULL,
+            counter INTEGER,
+            updated_at TIMESTAMP NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_archived_absences_chat_semester ON archived_absences (chat_id, semester);",
+    ],
+]
+
+class SQLiteBase(Storage):
+    """Embedded SQLite storage for single-instance deployments, tests and benchmarks."""
+
+    def __init__(self, path: str = None):
+        super().__init__()
+        self.path = path or os.getenv("SQLITE_PATH", "absences.db")
+        self.cache_size_kib = int(os.getenv("SQLITE_CACHE_KIB", "16384"))
+
+    def connect(self, database: str = None):
+        """Opens the database file, tunes it and applies pending schema migrations."""
+        try:
+            if self.conn is None:
+                self.conn = sqlite3.connect(self.path if database is None else database, check_same_thread=False)
+                self.conn.execute("PRAGMA journal_mode = WAL;")
+                self.conn.execute("PRAGMA synchronous = NORMAL;")
+                self.conn.execute(f"PRAGMA cache_size = -{self.cache_size_kib};")
+                self.conn.execute("PRAGMA temp_store = MEMORY;")
+                self.conn.execute("PRAGMA busy_timeout = 5000;")
+                self.conn.execute("PRAGMA foreign_keys = ON;")
+                self._migrate()
+                logger.info("SQLite database connection established successfully.")
+        except Exception as e:
+            _, _, exc_tb = sys.exc_info()
+            logger.error(f"Error connecting to the SQLite database on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+            raise
+
+    def _migrate(self):
+        """Applies the schema migrations newer than the database's user_version."""
+        version = self.conn.execute("PRAGMA user_version;").fetchone()[0]
+        for target, statements in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            with self.conn:
+                for statement in statements:
+                    self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {target};")
+            logger.info(f"SQLite schema migrated to version {target}.")
+
+    def close(self):
+        """Closes the database connection."""
+        if self.conn:
+            self.conn.close()
+        self.conn = None
+        logger.info("SQLite database connection closed.")
+
+    def execute_query(self, query, params=None):
+        """Executes a query with the given parameters."""
+        with self.lock:
+            try:
+                logger.debug("Executing query: %s with params: %s", query, params, extra=QUERY_LOG_EXTRA)
+                self.conn.execute(query.replace("%s", "?"), params or ())
+                if not self.in_transaction:
+                    self.conn.commit()
+                logger.debug("Query executed successfully.", extra=QUERY_LOG_EXTRA)
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error executing query on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                if not self.in_transaction:
+                    self.conn.rollback()
+                raise
+
+    def fetch_all(self, query, params=None):
+        """Executes a query and fetches all results."""
+        with self.lock:
+            try:
+                logger.debug("Fetching all results for query: %s with params: %s", query, params, extra=QUERY_LOG_EXTRA)
+                return self.conn.execute(query.replace("%s", "?"), params or ()).fetchall()
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error fetching data on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                raise
+
+    def fetch_one(self, query, params=None):
+        """Executes a query and fetches a single result."""
+        with self.lock:
+            try:
+                logger.debug("Fetching one result for query: %s with params: %s", query, params, extra=QUERY_LOG_EXTRA)
+                cursor = self.conn.execute(query.replace("%s", "?"), params or ())
+                result = cursor.fetchone()
+                cursor.close()
+                return result
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error fetching data on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                raise
+
+    def ensure_archive_partition(self, semester: str):
+        """SQLite archive tables are not partitioned, so every semester fits as is."""
+
+    def _begin(self):
+        """Takes the write lock up front, so the transaction never fails halfway on a busy database."""
+        self.conn.execute("BEGIN IMMEDIATE;")
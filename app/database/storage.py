@@ -0,0 +1,95 @@
+import os
+import logging
+import sys
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_EXTRA = {"category": "db.query"}
+
+class Storage(ABC):
+    """Low-level query interface used by BotDB.
+
+    Queries are written with ``%s`` placeholders; each backend adapts them to its driver.
+    """
+
+    # Appended to SELECTs whose rows are about to be moved, so concurrent writers wait for the commit.
+    ROW_LOCK_CLAUSE = ""
+
+    def __init__(self):
+        self.conn = None
+        # The connection is shared by the bot's worker threads, so each query and each whole
+        # transaction holds this lock; the transaction flag is per thread.
+        self.lock = threading.RLock()
+        self.local = threading.local()
+
+    @property
+    def in_transaction(self) -> bool:
+        return getattr(self.local, "in_transaction", False)
+
+    @abstractmethod
+    def connect(self, database: str = None):
+        """Establishes a persistent connection to the database."""
+
+    @abstractmethod
+    def close(self):
+        """Closes the database connection."""
+
+    @abstractmethod
+    def execute_query(self, query, params=None):
+        """Executes a query with the given parameters."""
+
+    @abstractmethod
+    def fetch_all(self, query, params=None):
+        """Executes a query and fetches all results."""
+
+    @abstractmethod
+    def fetch_one(self, query, params=None):
+        """Executes a query and fetches a single result."""
+
+    @abstractmethod
+    def _begin(self):
+        """Prepares the connection for a transaction; called with the lock held."""
+
+    @contextmanager
+    def transaction(self):
+        """Groups the enclosed queries into a single transaction with one commit.
+
+        Other threads wait for the commit or rollback before running their own queries.
+        """
+        with self.lock:
+            self._begin()
+            self.local.in_transaction = True
+            try:
+                yield self
+                self.conn.commit()
+                logger.debug("Transaction committed successfully.", extra=QUERY_LOG_EXTRA)
+            except Exception as e:
+                _, _, exc_tb = sys.exc_info()
+                logger.error(f"Error in transaction on line {exc_tb.tb_lineno}: {e}", exc_info=True)
+                self.conn.rollback()
+                raise
+            finally:
+                self.local.in_transaction = False
+
+    @abstractmethod
+    def ensure_archive_partition(self, semester: str):
+        """Makes sure the archive tables can store rows of the given semester."""
+
+
+def create_storage() -> Storage:
+    """Creates and connects the storage selected by the DB_BACKEND environment variable."""
+    backend = os.getenv("DB_BACKEND", "postgres").lower()
+    if backend == "postgres":
+        from app.database.base import Base
+        storage = Base()
+        storage.connect(os.getenv("PG_DATABASE"))
+    elif backend == "sqlite":
+        from app.database.sqlite_base import SQLiteBase
+        storage = SQLiteBase(os.getenv("SQLITE_PATH", "absences.db"))
+        storage.connect()
+    else:
+        raise ValueError(f"Unsupported DB_BACKEND '{backend}'. Use 'postgres' or 'sqlite'.")
+    return storage
@@ -1,10 +1,10 @@
 import os
-import telebot
-from dotenv import load_dotenv
 
 from app.database.bot_db import BotDB
 from app.src.bot_handler import BotHandler
-from app.src.bot_setup import initialize_bot, setup_handlers, start_polling, logger
+from app.src.scheduler import DigestScheduler
+from app.src.profiler import SamplingProfiler
+from app.src.bot_setup import initialize_bot, register_commands, setup_handlers, start_polling, logger
 
 if __name__ == "__main__":
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
@@ -13,22 +13,28 @@ if __name__ == "__main__":
     db_client = None
     try:
         bot = initialize_bot(logger)
+        register_commands(bot, logger)
         db_client = BotDB(logger)
-        bot_handler = BotHandler(db_client, logger)
 
-        bot.set_my_commands([
-            telebot.types.BotCommand(command="/start", description="Iniciar o bot"),
-            telebot.types.BotCommand(command="/add_absence", description="Adicionar uma falta"),
-            telebot.types.BotCommand(command="/remove_absence", description="Remover uma falta"),
-            telebot.types.BotCommand(command="/my_absences", description="Ver minhas faltas"),
-            telebot.types.BotCommand(command="/list_classes", description="Listar disciplinas"),
-            telebot.types.BotCommand(command="/total_absences", description="Ver total de faltas"),
-            telebot.types.BotCommand(command="/register_class", description="Registrar uma nova disciplina"),
-            telebot.types.BotCommand(command="/help", description="Obter informações sobre o bot"),
-            telebot.types.BotCommand(command="/menu", description="Exibe o menu de opções")
-        ])
+        scheduler = None
+        if os.getenv("DIGEST_ENABLED", "false").lower() == "true":
+            scheduler = DigestScheduler(
+                bot,
+                BotDB(logger),
+                logger,
+                weekday=int(os.getenv("DIGEST_WEEKDAY", "0")),
+                hour=int(os.getenv("DIGEST_HOUR", "9")),
+                batch_size=int(os.getenv("DIGEST_BATCH_SIZE", "25")),
+                batch_interval=float(os.getenv("DIGEST_BATCH_INTERVAL", "1.0"))
+            )
+        profiler = SamplingProfiler(logger, bot)
+        profiler.install_signal_handler(int(os.getenv("PROFILE_SECONDS", "30")))
+        admin_chat_ids = [chat_id.strip() for chat_id in os.getenv("ADMIN_CHAT_IDS", "").split(",") if chat_id.strip()]
+        bot_handler = BotHandler(db_client, logger, scheduler, profiler, admin_chat_ids)
 
         setup_handlers(bot, bot_handler, logger)
+        if scheduler:
+            scheduler.start()
         start_polling(bot, logger)
 
     except ValueError as e:
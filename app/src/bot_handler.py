@@ -1,14 +1,26 @@
+import re
 import sys
+from typing import TYPE_CHECKING
+
 from telebot import types
 
-from app.database.bot_db import BotDB
+if TYPE_CHECKING:
+    from app.database.bot_db import BotDB
+
+MAX_SEMESTER_LENGTH = 20
+
+CLASS_COUNT_PATTERN = re.compile(r"^(?P<class_id>.+?)(?:[xX](?P<count>\d+))?$")
 
 class BotHandler:
-    def __init__(self, db_client: BotDB, logger):
+    def __init__(self, db_client: "BotDB", logger, scheduler=None, profiler=None, admin_chat_ids=()):
         self.db = db_client
         self.logger = logger
+        self.scheduler = scheduler
+        self.profiler = profiler
+        self.admin_chat_ids = set(admin_chat_ids)
         self.user_states = {}
         self.user_data = {}
+        self.multi_selections = {}
         self.message_handlers = self._get_message_handlers()
         self.callback_handlers = self._get_callback_handlers()
         self.action_handlers = self._get_action_handlers()
@@ -24,6 +36,9 @@ class BotHandler:
             "/remove_absence": self._remove_absence_command,
             "/total_absences": self._total_absences_command,
             "/list_classes": self._list_classes_command,
+            "/set_limit": self._set_limit_command,
+            "/close_semester": self._close_semester_command,
+            "/history": self._history_command,
             "/help": self._help_command,
             "/menu": self._menu_command,
         }
@@ -39,6 +54,9 @@ class BotHandler:
             "help": self._help_command,
             "back_to_menu": self._menu_command,
             "skip_semester": self._skip_semester_callback,
+            "skip_absence_limit": self._skip_absence_limit_callback,
+            "add_absence_multi": self._ask_multi_class_selection,
+            "multi_confirm": self._multi_confirm_callback,
         }
 
     def _get_action_handlers(self):
@@ -46,6 +64,7 @@ class BotHandler:
             "add_absence": self._add_absence_action,
             "remove_absence": self._remove_absence_action,
             "my_absences": self._my_absences_action,
+            "multi_toggle": self._multi_toggle_action,
         }
 
     def _get_conversation_handlers(self):
@@ -53,6 +72,7 @@ class BotHandler:
             "AWAITING_CLASS_ID": self._handle_class_id,
             "AWAITING_CLASS_NAME": self._handle_class_name,
             "AWAITING_SEMESTER": self._handle_semester,
+            "AWAITING_ABSENCE_LIMIT": self._handle_absence_limit,
         }
 
     def handle_message(self, message):
@@ -61,12 +81,14 @@ class BotHandler:
         first_name = message.from_user.first_name
         text = message.text.strip()
 
-        self.logger.info(f"Received message from chat {chat_id} (user: {username or first_name}): '{text}'")
+        self.logger.info("Received message from chat %s (user: %s): '%s'", chat_id, username or first_name, text, extra={"category": "handler.message"})
 
         if not self.db.check_if_chat_exists(chat_id):
             try:
                 self.db.insert_chat(chat_id, username, first_name)
                 self.logger.info(f"Chat {chat_id} registered successfully.")
+                if self.scheduler:
+                    self.scheduler.schedule(chat_id)
             except Exception as e:
                 _, _, exc_tb = sys.exc_info()
                 self.logger.error(f"Failed to register chat {chat_id} on line {exc_tb.tb_lineno}: {e}", exc_info=True)
@@ -80,6 +102,8 @@ class BotHandler:
 
         command = text.split(maxsplit=1)[0]
         handler = self.message_handlers.get(command)
+        if command == "/profile" and self.profiler and chat_id in self.admin_chat_ids:
+            handler = self._profile_command
 
         if handler:
             return handler(chat_id, text)
@@ -89,7 +113,7 @@ class BotHandler:
 
     def handle_callback_query(self, call):
         chat_id = str(call.message.chat.id)
-        self.logger.info(f"Handling callback query from chat {chat_id}: {call.data}")
+        self.logger.info("Handling callback query from chat %s: %s", chat_id, call.data, extra={"category": "handler.callback"})
 
         data = call.data
 
@@ -107,7 +131,7 @@ class BotHandler:
                     return {"type": "edit_message", "text": response[0], "reply_markup": response[1]}
                 elif data == "register_class":
                     return handler(chat_id, call.message.text)
-                elif data == "skip_semester":
+                elif data in ["skip_semester", "skip_absence_limit"]:
                     return handler(chat_id)
                 else:
                     response = handler(chat_id)
@@ -139,7 +163,10 @@ class BotHandler:
             types.InlineKeyboardButton("Total de Faltas", callback_data="total_absences"),
             types.InlineKeyboardButton("Registrar Disciplina", callback_data="register_class")
         )
-        keyboard.row(types.InlineKeyboardButton("Ajuda", callback_data="help"))
+        keyboard.row(
+            types.InlineKeyboardButton("Várias Faltas", callback_data="add_absence_multi"),
+            types.InlineKeyboardButton("Ajuda", callback_data="help")
+        )
         return keyboard
 
     def _create_classes_keyboard(self, chat_id, action):
@@ -162,6 +189,20 @@ class BotHandler:
         keyboard.add(types.InlineKeyboardButton("⬅ Voltar", callback_data="back_to_menu"))
         return keyboard
 
+    def _create_multi_classes_keyboard(self, chat_id):
+        keyboard = types.InlineKeyboardMarkup()
+        selection = self.multi_selections[chat_id]
+        for cls in selection["classes"]:
+            mark = "✅ " if cls["class_id"] in selection["selected"] else ""
+            label = f"{mark}{cls['name']} ({cls['class_id']})"
+            keyboard.add(types.InlineKeyboardButton(label, callback_data=f"multi_toggle:{cls['class_id']}"))
+
+        keyboard.row(
+            types.InlineKeyboardButton("Confirmar", callback_data="multi_confirm"),
+            types.InlineKeyboardButton("⬅ Voltar", callback_data="back_to_menu")
+        )
+        return keyboard
+
     def _start_command(self, chat_id, text):
         first_name = "user"
         self.logger.info(f"Handling /start command for chat {chat_id}.")
@@ -207,11 +248,42 @@ class BotHandler:
 
     def _handle_semester(self, chat_id, text):
         self.logger.info(f"Handling semester for chat {chat_id}: {text}")
-        self.user_data[chat_id]["semester"] = text
-        
+        semester = self._normalize_semester(text)
+        if len(semester) > MAX_SEMESTER_LENGTH:
+            keyboard = types.InlineKeyboardMarkup()
+            keyboard.row(
+                types.InlineKeyboardButton("Pular", callback_data="skip_semester"),
+                types.InlineKeyboardButton("Menu", callback_data="back_to_menu")
+            )
+            return {"type": "send_message", "text": f"Informe o semestre com até {MAX_SEMESTER_LENGTH} caracteres (ex: 2024.1).", "reply_markup": keyboard}
+        self.user_data[chat_id]["semester"] = semester
+        self.user_states[chat_id] = "AWAITING_ABSENCE_LIMIT"
+        keyboard = types.InlineKeyboardMarkup()
+        keyboard.row(
+            types.InlineKeyboardButton("Pular", callback_data="skip_absence_limit"),
+            types.InlineKeyboardButton("Menu", callback_data="back_to_menu")
+        )
+        return {"type": "send_message", "text": "Qual é o limite de faltas da disciplina (opcional, ex: 15 para 25% de 60 aulas)?", "reply_markup": keyboard}
+
+    def _skip_absence_limit_callback(self, chat_id):
+        return self._handle_absence_limit(chat_id, "")
+
+    def _handle_absence_limit(self, chat_id, text):
+        self.logger.info(f"Handling absence limit for chat {chat_id}: {text}")
+        try:
+            absence_limit = self._parse_absence_limit(text) if text else None
+        except ValueError:
+            keyboard = types.InlineKeyboardMarkup()
+            keyboard.row(
+                types.InlineKeyboardButton("Pular", callback_data="skip_absence_limit"),
+                types.InlineKeyboardButton("Menu", callback_data="back_to_menu")
+            )
+            return {"type": "send_message", "text": "Informe o limite de faltas como um número inteiro maior que zero.", "reply_markup": keyboard}
+        self.user_data[chat_id]["absence_limit"] = absence_limit
+
         class_data = self.user_data[chat_id]
         try:
-            self.db.insert_class(chat_id, class_data["class_id"], class_data["name"], class_data["semester"])
+            self.db.insert_class(chat_id, class_data["class_id"], class_data["name"], class_data["semester"], class_data["absence_limit"])
             response = f"Disciplina '{class_data['name']}' ({class_data['class_id']}) registrada com sucesso!"
             del self.user_states[chat_id]
             del self.user_data[chat_id]
@@ -224,11 +296,41 @@ class BotHandler:
             return self._create_response_with_menu(response)
 
     def _add_absence_command(self, chat_id, text):
-        parts = text.split(maxsplit=1)
+        parts = text.split()
         if len(parts) < 2:
             return self._ask_class_selection(chat_id, action="add_absence")
-        class_id = parts[1]
-        return self._add_absence_action(chat_id, class_id)
+
+        for token in parts[1:]:
+            count = CLASS_COUNT_PATTERN.match(token).group("count")
+            if count is not None and int(count) < 1:
+                return self._create_response_with_menu(f"Erro: Quantidade inválida em '{token}'.")
+        # The arguments are split into classes against the rows insert_absences reads, so the batch needs one class query.
+        return self._add_absences_action(chat_id, lambda known_ids: self._parse_class_counts(parts[1:], known_ids))
+
+    def _parse_class_counts(self, tokens, known_ids):
+        """Splits /add_absence arguments into class_id -> count."""
+        class_counts = {}
+        while tokens:
+            class_id, count, used = self._match_class_tokens(tokens, known_ids)
+            class_counts[class_id] = class_counts.get(class_id, 0) + count
+            tokens = tokens[used:]
+        return class_counts
+
+    def _match_class_tokens(self, tokens, known_ids):
+        """Matches the longest run of leading tokens naming a registered class, with an optional x<n> suffix.
+
+        Class ids may contain spaces, so "CS 101x2" resolves to class "CS 101". Tokens that don't
+        name a registered class are taken one at a time and reported as not found.
+        """
+        for end in range(len(tokens), 0, -1):
+            candidate = " ".join(tokens[:end])
+            if candidate in known_ids:
+                return candidate, 1, end
+            match = CLASS_COUNT_PATTERN.match(candidate)
+            if match.group("count") and match.group("class_id") in known_ids:
+                return match.group("class_id"), int(match.group("count")), end
+        match = CLASS_COUNT_PATTERN.match(tokens[0])
+        return match.group("class_id"), int(match.group("count") or 1), 1
 
     def _my_absences_command(self, chat_id, text):
         parts = text.split(maxsplit=1)
@@ -269,12 +371,119 @@ class BotHandler:
                 response += f"- {cls['name']} ({cls['class_id']})"
                 if cls['semester']:
                     response += f" - Semestre: {cls['semester']}"
+                if cls['absence_limit']:
+                    response += f" - Limite: {cls['absence_limit']} faltas"
                 response += "\n"
             return self._create_response_with_menu(response)
         except Exception as e:
             self.logger.error(f"Error listing classes: {e}", exc_info=True)
             return self._create_response_with_menu("Erro ao listar disciplinas.")
 
+    def _set_limit_command(self, chat_id, text):
+        usage = "Uso: /set_limit <id_da_disciplina> [limite]. O limite deve ser um número inteiro maior que zero; omita-o para removê-lo."
+        parts = text.split()
+        if len(parts) < 2:
+            return self._create_response_with_menu(usage)
+        try:
+            known_ids = {cls["class_id"] for cls in self.db.get_all_classes(chat_id)}
+            # Class ids may contain spaces, so a trailing number is the limit only when the whole text is not a class id.
+            class_id, absence_limit = " ".join(parts[1:]), None
+            if class_id not in known_ids and len(parts) > 2:
+                class_id, absence_limit = " ".join(parts[1:-1]), self._parse_absence_limit(parts[-1])
+        except ValueError:
+            return self._create_response_with_menu(usage)
+        except Exception as e:
+            self.logger.error(f"Error getting classes for chat {chat_id}: {e}", exc_info=True)
+            return self._create_response_with_menu("Erro ao definir limite de faltas.")
+        try:
+            if not self.db.set_absence_limit(chat_id, class_id, absence_limit):
+                return self._create_response_with_menu(f"Erro: Disciplina '{class_id}' não encontrada.")
+            if absence_limit is None:
+                return self._create_response_with_menu(f"Limite de faltas removido para '{class_id}'.")
+            return self._create_response_with_menu(f"Limite de faltas de '{class_id}' definido para {absence_limit}.")
+        except Exception as e:
+            self.logger.error(f"Error setting absence limit: {e}", exc_info=True)
+            return self._create_response_with_menu("Erro ao definir limite de faltas.")
+
+    def _parse_absence_limit(self, text):
+        """Parses an absence limit, raising ValueError unless it is a whole number of at least 1."""
+        absence_limit = int(text)
+        if absence_limit < 1:
+            raise ValueError(f"Absence limit must be at least 1, got {absence_limit}")
+        return absence_limit
+
+    def _normalize_semester(self, text):
+        """Collapses whitespace in a semester, so it matches the value stored at registration."""
+        return " ".join(text.split())
+
+    def _close_semester_command(self, chat_id, text):
+        parts = text.split(maxsplit=1)
+        semester = self._normalize_semester(parts[1]) if len(parts) == 2 else ""
+        if not semester or len(semester) > MAX_SEMESTER_LENGTH:
+            return self._create_response_with_menu(
+                "Uso: /close_semester <semestre>. As disciplinas do semestre e suas faltas serão movidas para o histórico. "
+                "Disciplinas registradas sem semestre continuam ativas."
+            )
+        try:
+            archived = self.db.close_semester(chat_id, semester)
+            if not archived:
+                return self._create_response_with_menu(f"Nenhuma disciplina ativa no semestre '{semester}'.")
+            return self._create_response_with_menu(f"Semestre '{semester}' encerrado: {archived} disciplina(s) movida(s) para o histórico. Use /history para consultá-lo.")
+        except Exception as e:
+            self.logger.error(f"Error closing semester: {e}", exc_info=True)
+            return self._create_response_with_menu("Erro ao encerrar semestre.")
+
+    def _history_command(self, chat_id, text):
+        parts = text.split(maxsplit=1)
+        try:
+            if len(parts) < 2:
+                semesters = self.db.get_archived_semesters(chat_id)
+                if not semesters:
+                    return self._create_response_with_menu("Nenhum semestre encerrado ainda. Use /close_semester para arquivar um semestre.")
+                response = "Semestres encerrados:\n"
+                for row in semesters:
+                    response += f"- {row['semester']}: {row['classes']} disciplina(s)\n"
+                response += "Use /history <semestre> para ver as faltas de um semestre."
+                return self._create_response_with_menu(response)
+
+            semester = self._normalize_semester(parts[1])
+            classes = self.db.get_archived_absences(chat_id, semester)
+            if not classes:
+                return self._create_response_with_menu(f"Nenhum histórico encontrado para o semestre '{semester}'.")
+            response = f"Faltas do semestre {semester}:\n"
+            for row in classes:
+                response += f"- {row['class_name']} ({row['class_id']}): {row['count']} falta(s)"
+                if row['absence_limit']:
+                    response += f" de {row['absence_limit']} permitidas"
+                response += "\n"
+            return self._create_response_with_menu(response)
+        except Exception as e:
+            self.logger.error(f"Error getting history: {e}", exc_info=True)
+            return self._create_response_with_menu("Erro ao consultar histórico.")
+
+    def _profile_command(self, chat_id, text):
+        parts = text.split()
+        try:
+            if len(parts) > 2:
+                raise ValueError(text)
+            duration = int(parts[1]) if len(parts) == 2 else 30
+        except ValueError:
+            return {"type": "send_message", "text": "Uso: /profile [segundos]"}
+        self.logger.info(f"Admin chat {chat_id} requested profiling for {duration}s.")
+        duration = self.profiler.start(duration, chat_id)
+        if duration is None:
+            return {"type": "send_message", "text": "Já existe um perfil em andamento."}
+        return {"type": "send_message", "text": f"Perfil iniciado por {duration}s. O resumo será enviado ao final."}
+
+    def _format_limit_alerts(self, alerts):
+        text = ""
+        for alert in alerts:
+            if alert["threshold"] >= 1:
+                text += f"⚠️ Você atingiu o limite de {alert['limit']} faltas em '{alert['class_id']}' ({alert['count']} faltas).\n"
+            else:
+                text += f"⚠️ Você já usou {alert['count']} de {alert['limit']} faltas permitidas em '{alert['class_id']}'.\n"
+        return text
+
     def _help_command(self, chat_id, text=None):
         return self._create_response_with_menu((
             "Projeto desenvolvido por https://github.com/lionezajoao:\n"
@@ -292,18 +501,76 @@ class BotHandler:
         keyboard = self._create_classes_keyboard(chat_id, action)
         return title, keyboard
 
+    def _ask_multi_class_selection(self, chat_id):
+        try:
+            classes = self.db.get_all_classes(chat_id)
+        except Exception as e:
+            self.logger.error(f"Erro ao buscar disciplinas para teclado: {e}", exc_info=True)
+            classes = []
+
+        if not classes:
+            return self._ask_class_selection(chat_id, action="add_absence")
+
+        self.multi_selections[chat_id] = {"classes": classes, "selected": set()}
+        return "Selecione as disciplinas para adicionar falta e toque em Confirmar:", self._create_multi_classes_keyboard(chat_id)
+
+    def _multi_toggle_action(self, chat_id, class_id):
+        selection = self.multi_selections.get(chat_id)
+        if not selection:
+            title, keyboard = self._ask_multi_class_selection(chat_id)
+            return {"type": "edit_message", "text": title, "reply_markup": keyboard}
+
+        if class_id in selection["selected"]:
+            selection["selected"].remove(class_id)
+        else:
+            selection["selected"].add(class_id)
+        return {
+            "type": "edit_message",
+            "text": f"Selecione as disciplinas para adicionar falta e toque em Confirmar ({len(selection['selected'])} selecionada(s)):",
+            "reply_markup": self._create_multi_classes_keyboard(chat_id)
+        }
+
+    def _multi_confirm_callback(self, chat_id):
+        selection = self.multi_selections.pop(chat_id, None)
+        if not selection or not selection["selected"]:
+            return self._create_response_with_menu("Nenhuma disciplina selecionada.")
+        class_counts = {cls["class_id"]: 1 for cls in selection["classes"] if cls["class_id"] in selection["selected"]}
+        return self._add_absences_action(chat_id, class_counts)
+
     def _add_absence_action(self, chat_id, class_id):
         try:
-            success = self.db.insert_absence(chat_id, class_id)
-            if success:
-                count = self.db.get_absence_count(chat_id, class_id)
-                return self._create_response_with_menu(f"Falta adicionada para '{class_id}'. Total de faltas: {count}.")
+            result = self.db.insert_absences(chat_id, {class_id: 1})
+            if class_id in result["added"]:
+                response = f"Falta adicionada para '{class_id}'. Total de faltas: {result['added'][class_id]}."
+                if result["alerts"]:
+                    response += "\n" + self._format_limit_alerts(result["alerts"])
+                return self._create_response_with_menu(response)
             else:
                 return self._create_response_with_menu(f"Erro: Disciplina '{class_id}' não encontrada.")
         except Exception as e:
             self.logger.error(f"Error adding absence: {e}", exc_info=True)
             return self._create_response_with_menu("Erro ao adicionar falta.")
 
+    def _add_absences_action(self, chat_id, class_counts):
+        try:
+            result = self.db.insert_absences(chat_id, class_counts)
+        except Exception as e:
+            self.logger.error(f"Error adding absences: {e}", exc_info=True)
+            return self._create_response_with_menu("Erro ao adicionar faltas.")
+
+        if not result["added"]:
+            missing = ", ".join(f"'{class_id}'" for class_id in result["not_found"])
+            return self._create_response_with_menu(f"Erro: Disciplina(s) {missing} não encontrada(s).")
+
+        response = "Faltas adicionadas:\n"
+        for class_id, count in result["counts"].items():
+            if class_id in result["added"]:
+                response += f"- {class_id}: +{count} (total de faltas: {result['added'][class_id]})\n"
+        if result["not_found"]:
+            response += f"Disciplina(s) não encontrada(s): {', '.join(result['not_found'])}\n"
+        response += self._format_limit_alerts(result["alerts"])
+        return self._create_response_with_menu(response)
+
     def _my_absences_action(self, chat_id, class_id):
         try:
             count = self.db.get_absence_count(chat_id, class_id)
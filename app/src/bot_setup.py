@@ -1,54 +1,126 @@
 import os
+import json
+import hashlib
+import threading
+from typing import TYPE_CHECKING
+
 import telebot
+from telebot import apihelper
 from dotenv import load_dotenv
 
 from app.src.config import get_logger
-from app.src.bot_handler import BotHandler
+from app.src.structured_logging import bind_context
+from app.src.transport import configure_transport
+
+if TYPE_CHECKING:
+    from app.src.bot_handler import BotHandler
 
 load_dotenv()
 
 logger = get_logger(__name__)
 
+# Kept in the app directory (mounted as a volume by docker-compose) so the cache survives restarts and redeploys.
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "bot_state")
+
+BOT_COMMANDS = [
+    ("/start", "Iniciar o bot"),
+    ("/add_absence", "Adicionar uma falta"),
+    ("/remove_absence", "Remover uma falta"),
+    ("/my_absences", "Ver minhas faltas"),
+    ("/list_classes", "Listar disciplinas"),
+    ("/total_absences", "Ver total de faltas"),
+    ("/register_class", "Registrar uma nova disciplina"),
+    ("/set_limit", "Definir o limite de faltas de uma disciplina"),
+    ("/close_semester", "Encerrar um semestre e arquivar suas disciplinas"),
+    ("/history", "Ver faltas de semestres encerrados"),
+    ("/help", "Obter informações sobre o bot"),
+    ("/menu", "Exibe o menu de opções"),
+]
+
 def initialize_bot(logger):
     """Initializes and returns the TeleBot instance."""
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     if not BOT_TOKEN:
         logger.critical("BOT_TOKEN environment variable not set. Exiting.")
         raise ValueError("BOT_TOKEN environment variable not set.")
+    # Middlewares tag each message with its update_id for log correlation; they must be enabled before the bot is built.
+    apihelper.ENABLE_MIDDLEWARE = True
+    configure_transport(logger)
     return telebot.TeleBot(BOT_TOKEN)
 
-def setup_handlers(bot: telebot.TeleBot, bot_handler: BotHandler, logger):
+def register_commands(bot: telebot.TeleBot, logger) -> threading.Thread:
+    """Registers the bot commands in the background so polling can start right away."""
+    thread = threading.Thread(target=_register_commands, args=(bot, logger), name="register-commands", daemon=True)
+    thread.start()
+    return thread
+
+def _register_commands(bot: telebot.TeleBot, logger):
+    """Calls set_my_commands only when the command list changed since the last registration."""
+    digest = hashlib.sha256(json.dumps([bot.token, BOT_COMMANDS]).encode()).hexdigest()
+    state_dir = os.getenv("BOT_STATE_DIR") or DEFAULT_STATE_DIR
+    cache_file = os.path.join(state_dir, "bot_commands.sha256")
+    try:
+        with open(cache_file) as f:
+            if f.read().strip() == digest:
+                logger.info("Bot commands unchanged, skipping registration.")
+                return
+    except OSError:
+        pass
+
+    try:
+        bot.set_my_commands([telebot.types.BotCommand(command=command, description=description) for command, description in BOT_COMMANDS])
+        os.makedirs(state_dir, exist_ok=True)
+        with open(cache_file, "w") as f:
+            f.write(digest)
+        logger.info("Bot commands registered.")
+    except Exception as e:
+        logger.error(f"Failed to register bot commands: {e}", exc_info=True)
+
+def setup_handlers(bot: telebot.TeleBot, bot_handler: "BotHandler", logger):
     """Sets up the message and callback query handlers for the bot."""
+    @bot.middleware_handler()
+    def tag_update_id(bot_instance, update):
+        for event in (update.message, update.callback_query):
+            if event is not None:
+                event.update_id = update.update_id
+
     @bot.message_handler(func=lambda message: True)
     def handle_all_messages(message):
-        try:
-            response = bot_handler.handle_message(message)
-            if response:
-                if response.get("type") == "send_message":
-                    bot.reply_to(message, response["text"], reply_markup=response.get("reply_markup"))
-        except Exception as e:
-            logger.exception(f"Error handling message from chat {message.chat.id}: {e}")
-            bot.reply_to(message, "Ocorreu um erro inesperado. Por favor, tente novamente mais tarde.")
+        with bind_context(getattr(message, "update_id", None), message.chat.id):
+            try:
+                response = bot_handler.handle_message(message)
+                if response:
+                    if response.get("type") == "send_message":
+                        bot.reply_to(message, response["text"], reply_markup=response.get("reply_markup"))
+            except Exception as e:
+                logger.exception(f"Error handling message from chat {message.chat.id}: {e}")
+                bot.reply_to(message, "Ocorreu um erro inesperado. Por favor, tente novamente mais tarde.")
 
     @bot.callback_query_handler(func=lambda call: True)
     def handle_callback_queries(call):
-        try:
-            response = bot_handler.handle_callback_query(call)
-            bot.answer_callback_query(call.id)
-            if response:
-                if response.get("type") == "send_message":
-                    bot.send_message(call.message.chat.id, response["text"], reply_markup=response.get("reply_markup"))
-                elif response.get("type") == "edit_message":
-                    bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id, text=response["text"], reply_markup=response.get("reply_markup"))
-        except Exception as e:
-            logger.exception(f"Error handling callback query from chat {call.message.chat.id}: {e}")
-            bot.send_message(call.message.chat.id, "Ocorreu um erro inesperado. Por favor, tente novamente mais tarde.")
+        with bind_context(getattr(call, "update_id", None), call.message.chat.id):
+            try:
+                response = bot_handler.handle_callback_query(call)
+                bot.answer_callback_query(call.id)
+                if response:
+                    if response.get("type") == "send_message":
+                        bot.send_message(call.message.chat.id, response["text"], reply_markup=response.get("reply_markup"))
+                    elif response.get("type") == "edit_message":
+                        bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id, text=response["text"], reply_markup=response.get("reply_markup"))
+            except Exception as e:
+                logger.exception(f"Error handling callback query from chat {call.message.chat.id}: {e}")
+                bot.send_message(call.message.chat.id, "Ocorreu um erro inesperado. Por favor, tente novamente mais tarde.")
 
 def start_polling(bot: telebot.TeleBot, logger):
     """Starts the bot's polling loop."""
     logger.info("Bot is starting...")
     try:
-        bot.polling(none_stop=True)
+        # getUpdates keeps the connect timeout of sends, while its read timeout follows the long-polling window.
+        bot.polling(
+            none_stop=True,
+            timeout=int(apihelper.CONNECT_TIMEOUT),
+            long_polling_timeout=int(os.getenv("POLLING_TIMEOUT", "20"))
+        )
     except Exception as e:
         logger.critical(f"Bot polling failed: {e}", exc_info=True)
         raise e
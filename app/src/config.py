@@ -2,14 +2,32 @@ import logging
 import logging.config
 import os
 
-def get_logger(name: str):
+_logging_configured = False
+
+def _configure_logging():
     """
-    Set up logging configuration from a file and return a logger instance.
+    Load the logging configuration file, falling back to a basic config.
     """
     config_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logging_config.ini')
     if os.path.exists(config_file):
-        logging.config.fileConfig(config_file)
+        logging.config.fileConfig(config_file, disable_existing_loggers=False)
     else:
         logging.basicConfig(level=logging.INFO)
         logging.warning(f"logging_config.ini not found at {config_file}. Using basic config.")
-    return logging.getLogger(name)
\ No newline at end of file
+
+    if os.getenv("LOG_MODE", "plain").lower() == "structured":
+        from app.src.structured_logging import enable_structured_logging, parse_sample_rates
+        enable_structured_logging(
+            parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+            int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        )
+
+def get_logger(name: str):
+    """
+    Set up logging configuration on the first call and return a logger instance.
+    """
+    global _logging_configured
+    if not _logging_configured:
+        _configure_logging()
+        _logging_configured = True
+    return logging.getLogger(name)
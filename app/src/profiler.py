@@ -0,0 +1,118 @@
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+HANDLER_FILES = ("bot_handler.py",)
+HANDLER_DISPATCHERS = ("handle_message", "handle_callback_query")
+QUERY_FILES = ("base.py", "sqlite_base.py")
+QUERY_FUNCTIONS = ("execute_query", "fetch_one", "fetch_all")
+MAX_DURATION = 300
+
+class SamplingProfiler:
+    """Time-boxed sampling profiler for the running bot.
+
+    While active, a background thread samples the stacks of every other thread at a fixed
+    interval. Nothing is hooked or patched, so there is no overhead when it is off. Each run
+    writes a collapsed-stack file (for flamegraph tools) and a summary of the handlers and
+    queries that took the most sampled time.
+    """
+
+    def __init__(self, logger, bot=None, output_dir: str = None, interval: float = 0.005, top_n: int = 10):
+        self.logger = logger
+        self.bot = bot
+        self.output_dir = output_dir or os.getenv("PROFILE_DIR", tempfile.gettempdir())
+        self.interval = interval
+        self.top_n = top_n
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, duration: float, chat_id: str = None):
+        """Starts profiling for ``duration`` seconds, clamped to 1-MAX_DURATION.
+
+        Returns the duration actually used, or None if a run is already active. When ``chat_id``
+        is given, the summary is sent to that chat once the run finishes.
+        """
+        duration = max(1, min(duration, MAX_DURATION))
+        with self.lock:
+            if self.is_running():
+                return None
+            self.thread = threading.Thread(target=self._run, args=(duration, chat_id), name="sampling-profiler", daemon=True)
+            self.thread.start()
+        self.logger.info(f"Sampling profiler started for {duration}s.")
+        return duration
+
+    def install_signal_handler(self, duration: float, signum: int = getattr(signal, "SIGUSR1", None)):
+        """Starts a profiling run whenever the process receives ``signum`` (SIGUSR1 by default)."""
+        if signum is None:
+            self.logger.warning("Signal-triggered profiling is not supported on this platform.")
+            return
+        signal.signal(signum, lambda received, frame: self.start(duration))
+
+    def _run(self, duration: float, chat_id: str):
+        try:
+            stacks, handlers, queries, samples = self._sample(duration)
+            summary = self._write_results(stacks, handlers, queries, samples, duration)
+            self.logger.info(summary)
+            if chat_id and self.bot:
+                self.bot.send_message(chat_id, summary)
+        except Exception as e:
+            self.logger.error(f"Sampling profiler failed: {e}", exc_info=True)
+
+    def _sample(self, duration: float):
+        own_id = threading.get_ident()
+        stacks, handlers, queries = Counter(), Counter(), Counter()
+        samples = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack, handler, query = self._walk(frame)
+                stacks[";".join(reversed(stack))] += 1
+                if handler:
+                    handlers[handler] += 1
+                if query:
+                    queries[query] += 1
+            samples += 1
+            time.sleep(self.interval)
+        return stacks, handlers, queries, samples
+
+    def _walk(self, frame):
+        """Returns the stack of ``frame`` (innermost first), the outermost handler and the innermost query it is in."""
+        stack, handler, query = [], None, None
+        while frame is not None:
+            code = frame.f_code
+            filename = os.path.basename(code.co_filename)
+            stack.append(f"{filename}:{code.co_name}")
+            if filename in HANDLER_FILES and code.co_name not in HANDLER_DISPATCHERS:
+                handler = code.co_name
+            if query is None and filename in QUERY_FILES and code.co_name in QUERY_FUNCTIONS:
+                query = " ".join(str(frame.f_locals.get("query", "")).split())[:120]
+            frame = frame.f_back
+        return stack, handler, query
+
+    def _write_results(self, stacks: Counter, handlers: Counter, queries: Counter, samples: int, duration: float) -> str:
+        ms_per_sample = duration * 1000 / max(samples, 1)
+        prefix = os.path.join(self.output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        with open(f"{prefix}.folded", "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        summary = f"Perfil de {duration}s ({samples} amostras), salvo em {prefix}.folded\n"
+        summary += "Handlers mais lentos:\n"
+        for name, count in handlers.most_common(self.top_n):
+            summary += f"- {name}: ~{count * ms_per_sample:.0f} ms ({count} amostras)\n"
+        summary += "Consultas mais lentas:\n"
+        for query, count in queries.most_common(self.top_n):
+            summary += f"- {query}: ~{count * ms_per_sample:.0f} ms ({count} amostras)\n"
+        with open(f"{prefix}.txt", "w") as f:
+            f.write(summary)
+        return summary
@@ -0,0 +1,130 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app.src.structured_logging import bind_context
+
+DIGEST_INTERVAL = timedelta(days=7)
+
+class DigestScheduler:
+    """Sends a weekly absence digest to each chat.
+
+    Next-due times are kept in a min-heap, so the worker thread only wakes up when the
+    earliest digest is due. All chats due at the same time share one aggregated query and
+    their messages are sent in rate-limited batches.
+    """
+
+    def __init__(self, bot, db_client, logger, weekday: int = 0, hour: int = 9, batch_size: int = 25, batch_interval: float = 1.0):
+        self.bot = bot
+        self.db = db_client
+        self.logger = logger
+        self.weekday = weekday
+        self.hour = hour
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue = []
+        self.scheduled = set()
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+    def next_slot(self, now: datetime = None) -> datetime:
+        """Returns the next weekly digest time after ``now``.
+
+        The slot is computed on local wall-clock time and only then given its UTC offset, so
+        digests stay at ``hour`` across daylight saving changes.
+        """
+        now = (now or datetime.now()).astimezone().replace(tzinfo=None)
+        slot = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        slot += timedelta(days=(self.weekday - now.weekday()) % 7)
+        if slot <= now:
+            slot += DIGEST_INTERVAL
+        return slot.astimezone()
+
+    def schedule(self, chat_id: str, due: datetime = None):
+        """Queues a chat for its next digest, ignoring chats that are already queued."""
+        with self.condition:
+            if chat_id in self.scheduled:
+                return
+            due = due or self.next_slot()
+            heapq.heappush(self.queue, (due.timestamp(), chat_id))
+            self.scheduled.add(chat_id)
+            self.condition.notify()
+        self.logger.debug(f"Digest for chat {chat_id} scheduled at {due.isoformat()}.")
+
+    def start(self):
+        """Schedules every registered chat and starts the worker thread."""
+        for chat_id in self.db.get_all_chat_ids():
+            self.schedule(chat_id)
+        self.thread = threading.Thread(target=self._run, name="digest-scheduler", daemon=True)
+        self.thread.start()
+        self.logger.info(f"Digest scheduler started with {len(self.scheduled)} chats.")
+
+    def stop(self):
+        """Stops the worker thread."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+        self.logger.info("Digest scheduler stopped.")
+
+    def _pop_due(self):
+        """Blocks until at least one digest is due and returns the due (timestamp, chat_id) pairs."""
+        with self.condition:
+            while not self.stopped:
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+                delay = self.queue[0][0] - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                due = []
+                now = time.time()
+                while self.queue and self.queue[0][0] <= now:
+                    due.append(heapq.heappop(self.queue))
+                return due
+            return []
+
+    def _run(self):
+        while True:
+            due = self._pop_due()
+            if not due:
+                return
+            try:
+                self.send_digests([chat_id for _, chat_id in due])
+            except Exception as e:
+                self.logger.error(f"Error sending absence digests: {e}", exc_info=True)
+            with self.condition:
+                for timestamp, chat_id in due:
+                    next_due = self.next_slot(datetime.fromtimestamp(timestamp))
+                    heapq.heappush(self.queue, (next_due.timestamp(), chat_id))
+
+    def send_digests(self, chat_ids: list):
+        """Builds the digests of the given chats with one query and sends them in batches."""
+        digest = self.db.get_absence_digest(chat_ids)
+        messages = [(chat_id, self._format_digest(rows)) for chat_id, rows in digest.items()]
+        self.logger.info(f"Sending absence digest to {len(messages)} of {len(chat_ids)} due chats.")
+
+        for start in range(0, len(messages), self.batch_size):
+            if start:
+                time.sleep(self.batch_interval)
+            for chat_id, text in messages[start:start + self.batch_size]:
+                with bind_context(chat_id=chat_id):
+                    try:
+                        self.bot.send_message(chat_id, text)
+                    except Exception as e:
+                        self.logger.warning(f"Failed to send absence digest to chat {chat_id}: {e}")
+
+    def _format_digest(self, rows: list) -> str:
+        text = "Resumo semanal de faltas:\n"
+        for row in rows:
+            text += f"- {row['class_name']} ({row['class_id']}): {row['count']} falta(s)"
+            if row["absence_limit"]:
+                text += f" de {row['absence_limit']} permitidas"
+                if row["count"] >= row["absence_limit"]:
+                    text += " ⚠️"
+            text += "\n"
+        return text
@@ -0,0 +1,115 @@
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import random
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+update_id_var = contextvars.ContextVar("update_id", default=None)
+chat_id_var = contextvars.ContextVar("chat_id", default=None)
+
+@contextmanager
+def bind_context(update_id=None, chat_id=None):
+    """Attaches correlation ids to every record logged inside the block, including DB calls."""
+    update_token = update_id_var.set(update_id)
+    chat_token = chat_id_var.set(str(chat_id) if chat_id is not None else None)
+    try:
+        yield
+    finally:
+        update_id_var.reset(update_token)
+        chat_id_var.reset(chat_token)
+
+class ContextFilter(logging.Filter):
+    """Copies the bound correlation ids onto the record, in the thread that logged it."""
+
+    def filter(self, record):
+        record.update_id = update_id_var.get()
+        record.chat_id = chat_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of DEBUG and INFO records per category; warnings and errors always pass.
+
+    The category is the record's ``category`` extra, or its logger name. Rates are matched by the
+    longest dotted prefix, e.g. ``{"db": 0.1}`` also applies to ``db.query``.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def rate_for(self, category: str) -> float:
+        while category:
+            if category in self.rates:
+                return self.rates[category]
+            category = category.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(getattr(record, "category", record.name))
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, rendering the message only at write time."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "category": getattr(record, "category", None),
+            "update_id": getattr(record, "update_id", None),
+            "chat_id": getattr(record, "chat_id", None),
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class LazyQueueHandler(QueueHandler):
+    """Queue handler that leaves formatting to the listener thread and drops records when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_sample_rates(value: str) -> dict:
+    """Parses ``category=rate`` pairs such as ``db.query=0.1,handler=0.5``."""
+    rates = {}
+    for pair in filter(None, (item.strip() for item in value.split(","))):
+        category, _, rate = pair.partition("=")
+        rates[category.strip()] = float(rate)
+    return rates
+
+def enable_structured_logging(sample_rates: dict = None, queue_size: int = 10000) -> QueueListener:
+    """Moves the root logger's handlers behind a background queue listener with JSON output."""
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    for handler in handlers:
+        handler.setFormatter(JsonFormatter())
+        root.removeHandler(handler)
+
+    queue_handler = LazyQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+    queue_handler.addFilter(ContextFilter())
+    root.addHandler(queue_handler)
+
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
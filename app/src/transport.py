@@ -0,0 +1,55 @@
+import os
+import socket
+
+import requests
+from requests.adapters import HTTPAdapter
+from telebot import apihelper
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTP adapter whose pooled connections enable TCP keep-alive, so idle sockets survive NATs and proxies."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+        super().init_poolmanager(*args, **kwargs)
+
+def create_session(pool_size: int, connect_retries: int = 2) -> requests.Session:
+    """Builds a session backed by a single connection pool of ``pool_size`` keep-alive connections.
+
+    Only connection errors are retried, since Bot API calls such as sendMessage are not idempotent.
+    """
+    adapter = KeepAliveAdapter(
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        max_retries=Retry(total=connect_retries, connect=connect_retries, read=0, status=0, other=0, backoff_factor=0.2)
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def configure_transport(logger, pool_size: int = None, connect_timeout: float = None, read_timeout: float = None, api_url: str = None) -> requests.Session:
+    """Points telebot's request path at a shared pooled session, with send timeouts and an optional local Bot API server.
+
+    By default telebot keeps one session per worker thread and recreates it every 10 minutes,
+    which means new connections and TLS handshakes while updates are being answered.
+    """
+    pool_size = pool_size or int(os.getenv("HTTP_POOL_SIZE", "8"))
+    session = create_session(pool_size)
+    apihelper.session = session
+    apihelper.SESSION_TIME_TO_LIVE = None
+    apihelper.CONNECT_TIMEOUT = connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    apihelper.READ_TIMEOUT = read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+
+    api_url = (api_url or os.getenv("TELEGRAM_API_URL", "")).rstrip("/")
+    if api_url:
+        apihelper.API_URL = api_url + "/bot{0}/{1}"
+        apihelper.FILE_URL = api_url + "/file/bot{0}/{1}"
+
+    logger.info(
+        f"HTTP transport configured: pool of {pool_size} connections, "
+        f"timeouts {apihelper.CONNECT_TIMEOUT}s connect / {apihelper.READ_TIMEOUT}s read, "
+        f"API {api_url or 'https://api.telegram.org'}."
+    )
+    return session
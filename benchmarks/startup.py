@@ -0,0 +1,93 @@
+"""Measures the bot's cold start: module import time and the time until it is ready to poll.
+
+Each run uses a fresh interpreter and needs no database server or network access:
+
+* postgres: imports app.main's whole dependency graph, psycopg2 included, and builds the
+  PostgreSQL storage without connecting, as production containers start with DB_BACKEND=postgres
+* sqlite:   the in-memory SQLite backend, which connects and migrates as part of startup
+
+Exits with status 1 when the median startup of any measured backend exceeds the budget.
+
+    python -m benchmarks.startup --runs 10 --budget-ms 500 --backend postgres sqlite
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPTS = {
+    "postgres": """
+import time
+start = time.perf_counter()
+import app.main
+from app.database.base import Base
+from app.database.bot_db import BotDB
+from app.src.bot_handler import BotHandler
+from app.src.bot_setup import initialize_bot, setup_handlers, logger
+imported = time.perf_counter()
+bot = initialize_bot(logger)
+setup_handlers(bot, BotHandler(BotDB(logger, Base()), logger), logger)
+ready = time.perf_counter()
+print(imported - start, ready - start)
+""",
+    "sqlite": """
+import time
+start = time.perf_counter()
+from app.database.bot_db import BotDB
+from app.database.sqlite_base import SQLiteBase
+from app.src.bot_handler import BotHandler
+from app.src.bot_setup import initialize_bot, setup_handlers, logger
+imported = time.perf_counter()
+bot = initialize_bot(logger)
+storage = SQLiteBase(":memory:")
+storage.connect()
+setup_handlers(bot, BotHandler(BotDB(logger, storage), logger), logger)
+ready = time.perf_counter()
+print(imported - start, ready - start)
+""",
+}
+
+GET_LOGGER_SCRIPT = """
+import time
+from app.src.config import get_logger
+get_logger("benchmark")
+start = time.perf_counter()
+for _ in range(1000):
+    get_logger("benchmark")
+print((time.perf_counter() - start) / 1000)
+"""
+
+def run_script(script: str, backend: str = "sqlite") -> list:
+    env = dict(os.environ, BOT_TOKEN=os.getenv("BOT_TOKEN", "123456:benchmark"), DB_BACKEND=backend)
+    output = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    return [float(value) for value in output.strip().splitlines()[-1].split()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=500.0)
+    parser.add_argument("--backend", nargs="+", choices=sorted(STARTUP_SCRIPTS), default=["postgres", "sqlite"])
+    args = parser.parse_args()
+
+    exceeded = False
+    for backend in args.backend:
+        imports, startups = [], []
+        for _ in range(args.runs):
+            imported, ready = run_script(STARTUP_SCRIPTS[backend], backend)
+            imports.append(imported * 1000)
+            startups.append(ready * 1000)
+        startup_ms = statistics.median(startups)
+        exceeded = exceeded or startup_ms > args.budget_ms
+        print(f"{backend:>8} import:  median {statistics.median(imports):.1f} ms, max {max(imports):.1f} ms")
+        print(f"{backend:>8} startup: median {startup_ms:.1f} ms, max {max(startups):.1f} ms (budget {args.budget_ms:.0f} ms)")
+    get_logger_us = run_script(GET_LOGGER_SCRIPT)[0] * 1_000_000
+    print(f"get_logger: {get_logger_us:.2f} us per call after the first")
+    if exceeded:
+        print("Startup budget exceeded.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Compares per-send latency of telebot's default transport with the pooled keep-alive transport.
+
+A local Bot API stand-in answers sendMessage over HTTP/1.1 keep-alive. It sleeps
+``--handshake-ms`` on every new connection to model the TCP and TLS setup paid against
+api.telegram.org. Sends run through TeleBot.send_message from several threads, the same way
+the bot's worker threads answer updates. Four transports are compared:
+
+* fresh:   a new connection per request (telebot with SESSION_TIME_TO_LIVE=0), for reference only
+* stock:   telebot defaults (one session per thread, recreated every 10 minutes)
+* expiry:  telebot defaults with the 10-minute session reset compressed to ``--ttl-ms``
+* pooled:  app.src.transport.configure_transport
+
+Once connections are warm, stock and pooled are expected to be on par: the pooled transport
+is not faster per send. What it removes is the re-handshake every thread pays each time its
+session expires, which the expiry row makes visible by firing that reset many times per run.
+
+    python -m benchmarks.transport --sends 200 --threads 4 --handshake-ms 30 --ttl-ms 50
+"""
+import argparse
+import json
+import logging
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telebot
+from telebot import apihelper
+
+from app.src.transport import configure_transport
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    handshake_seconds = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+        time.sleep(self.handshake_seconds)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"ok": True, "result": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "ok"}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+def reset_apihelper():
+    apihelper.session = None
+    apihelper.SESSION_TIME_TO_LIVE = 600
+    apihelper.CONNECT_TIMEOUT = 15
+    apihelper.READ_TIMEOUT = 30
+
+def run_mode(mode: str, api_url: str, sends: int, threads: int, ttl_seconds: float) -> tuple:
+    reset_apihelper()
+    if mode == "fresh":
+        apihelper.SESSION_TIME_TO_LIVE = 0
+    elif mode == "expiry":
+        apihelper.SESSION_TIME_TO_LIVE = ttl_seconds
+    elif mode == "pooled":
+        configure_transport(logging.getLogger(__name__), pool_size=threads + 2)
+    apihelper.API_URL = api_url + "/bot{0}/{1}"
+
+    bot = telebot.TeleBot("123456:benchmark", threaded=False)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            bot.send_message(1, "ok")
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+
+    StandInHandler.connections = 0
+    workers = [threading.Thread(target=worker, args=(sends // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, StandInHandler.connections
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sends", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    parser.add_argument("--ttl-ms", type=float, default=50.0, help="Session lifetime used by the expiry mode in place of telebot's 10 minutes.")
+    args = parser.parse_args()
+
+    StandInHandler.handshake_seconds = args.handshake_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{args.sends} sends from {args.threads} threads, {args.handshake_ms:.0f} ms simulated handshake per connection")
+    for mode in ("fresh", "stock", "expiry", "pooled"):
+        latencies, connections = run_mode(mode, api_url, args.sends, args.threads, args.ttl_ms / 1000)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{mode:>6}: mean {statistics.mean(latencies):6.2f} ms, p50 {statistics.median(latencies):6.2f} ms, p95 {p95:6.2f} ms, {connections} connections")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()